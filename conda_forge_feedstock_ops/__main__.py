@@ -12,12 +12,8 @@ one can use the `tempfile` module to create temporary files and directories.
 These operations return their info by printing a JSON blob to stdout.
 """
 
-import copy
-import glob
-import json
 import logging
 import os
-import shutil
 import subprocess
 import sys
 import tempfile
@@ -43,17 +39,18 @@ log_level_option = click.option(
 
 
 @contextmanager
-def _setenv(name, value):
-    """set an environment variable temporarily"""
-    old = os.environ.get(name)
+def _setenv_many(env):
+    """set a mapping of environment variables temporarily"""
+    old = {name: os.environ.get(name) for name in env}
     try:
-        os.environ[name] = value
+        os.environ.update(env)
         yield
     finally:
-        if old is None:
-            del os.environ[name]
-        else:
-            os.environ[name] = old
+        for name, value in old.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
 
 
 def _get_existing_feedstock_node_attrs(existing_feedstock_node_attrs):
@@ -71,81 +68,141 @@ def _get_existing_feedstock_node_attrs(existing_feedstock_node_attrs):
 
 
 def _run_bot_task(func, *, log_level, existing_feedstock_node_attrs, **kwargs):
-    with (
-        tempfile.TemporaryDirectory() as tmpdir_cbld,
-        _setenv("CONDA_BLD_PATH", os.path.join(tmpdir_cbld, "conda-bld")),
-        tempfile.TemporaryDirectory() as tmpdir_cache,
-        _setenv("XDG_CACHE_HOME", tmpdir_cache),
-        tempfile.TemporaryDirectory() as tmpdir_conda_pkgs_dirs,
-        _setenv("CONDA_PKGS_DIRS", tmpdir_conda_pkgs_dirs),
-    ):
-        os.makedirs(os.path.join(tmpdir_cbld, "conda-bld"), exist_ok=True)
-
-        from conda_forge_feedstock_ops import setup_logging
-        from conda_forge_feedstock_ops.json import dumps
-        from conda_forge_feedstock_ops.os_utils import pushd
-
-        data = None
-        ret = copy.copy(kwargs)
-        try:
-            with (
-                redirect_stdout(sys.stderr),
-                tempfile.TemporaryDirectory() as tmpdir,
-                pushd(tmpdir),
-            ):
-                # logger call needs to be here so it gets the changed stdout/stderr
-                setup_logging(log_level)
-                if existing_feedstock_node_attrs is not None:
-                    attrs = _get_existing_feedstock_node_attrs(
-                        existing_feedstock_node_attrs
-                    )
-                    data = func(attrs=attrs, **kwargs)
-                else:
-                    data = func(**kwargs)
-
-            ret["data"] = data
-
-        except Exception as e:
-            ret["data"] = data
-            ret["error"] = repr(e)
-            ret["traceback"] = traceback.format_exc()
-
-        print(dumps(ret))
+    # all scratch dirs live under one temporary root
+    with tempfile.TemporaryDirectory() as tmpdir_root:
+        tmpdir_cbld = os.path.join(tmpdir_root, "cbld")
+        tmpdir_cache = os.path.join(tmpdir_root, "cache")
+        tmpdir_conda_pkgs_dirs = os.path.join(tmpdir_root, "pkgs")
+        tmpdir = os.path.join(tmpdir_root, "work")
+        for _dir in [
+            os.path.join(tmpdir_cbld, "conda-bld"),
+            tmpdir_cache,
+            tmpdir_conda_pkgs_dirs,
+            tmpdir,
+        ]:
+            os.makedirs(_dir)
+
+        with _setenv_many(
+            {
+                "CONDA_BLD_PATH": os.path.join(tmpdir_cbld, "conda-bld"),
+                "XDG_CACHE_HOME": tmpdir_cache,
+                "CONDA_PKGS_DIRS": tmpdir_conda_pkgs_dirs,
+            }
+        ):
+            from conda_forge_feedstock_ops import setup_logging
+            from conda_forge_feedstock_ops.json import dump
+            from conda_forge_feedstock_ops.os_utils import pushd
+
+            data = None
+            ret = dict(kwargs)
+            try:
+                with (
+                    redirect_stdout(sys.stderr),
+                    pushd(tmpdir),
+                ):
+                    # logger call needs to be here so it gets the changed stdout/stderr
+                    setup_logging(log_level)
+                    if existing_feedstock_node_attrs is not None:
+                        attrs = _get_existing_feedstock_node_attrs(
+                            existing_feedstock_node_attrs
+                        )
+                        data = func(attrs=attrs, **kwargs)
+                    else:
+                        data = func(**kwargs)
+
+                ret["data"] = data
+
+            except Exception as e:
+                ret["data"] = data
+                ret["error"] = repr(e)
+                ret["traceback"] = traceback.format_exc()
+
+            # compact since it is only ever parsed by the host process
+            dump(ret, sys.stdout, indent=None)
+            sys.stdout.write("\n")
+
+
+def _find_feedstock_dir(root):
+    """find the single `*-feedstock` directory in `root`"""
+    with os.scandir(root) as it:
+        fs_dirs = [
+            entry.path
+            for entry in it
+            if entry.name.endswith("-feedstock")
+            and not entry.name.startswith(".")
+            and entry.is_dir(follow_symlinks=False)
+        ]
+    assert len(fs_dirs) == 1, f"expected one feedstock, got {fs_dirs}"
+    return fs_dirs[0]
+
+
+# the rerender repo is thrown away afterwards, so we turn off fsyncs,
+# auto gc, commit signing, and any hooks from the user's git config
+_THROWAWAY_REPO_GIT_ARGS = [
+    "-c",
+    "core.fsync=none",
+    "-c",
+    "gc.auto=0",
+    "-c",
+    "commit.gpgsign=false",
+    "-c",
+    "core.hooksPath=/dev/null",
+]
+
+
+def _git_cmd(*args):
+    """make a git command to run in a throwaway repo"""
+    return ["git", *_THROWAWAY_REPO_GIT_ARGS, *args]
 
 
 def _execute_git_cmds_and_report(*, cmds, cwd, msg, ignore_stderr=False):
     logger = logging.getLogger("conda_forge_feedstock_ops.container")
 
+    # outputs are kept as bytes in lists and joined once since git diff output
+    # can be large, callers decode only what they use
+    _outputs = []
+    _outputs_stderr = []
     try:
-        _output = ""
-        _output_stderr = ""
         for cmd in cmds:
             gitret = subprocess.run(
                 cmd,
                 cwd=cwd,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE if ignore_stderr else subprocess.STDOUT,
-                text=True,
             )
-            logger.debug("git command %r output: %s", cmd, gitret.stdout)
-            _output += gitret.stdout
+            _outputs.append(gitret.stdout)
             if ignore_stderr:
-                _output_stderr += gitret.stderr
+                _outputs_stderr.append(gitret.stderr)
             gitret.check_returncode()
     except Exception as e:
         logger.error(
             "%s\noutput: %s\nstderr: %s",
             msg,
-            _output,
-            _output_stderr if ignore_stderr else "<in output>",
+            b"".join(_outputs).decode("utf-8", errors="replace"),
+            (
+                b"".join(_outputs_stderr).decode("utf-8", errors="replace")
+                if ignore_stderr
+                else "<in output>"
+            ),
             exc_info=e,
         )
         raise e
+    else:
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "git commands output:\n%s",
+                "\n".join(
+                    f"{cmd!r} output: {_output.decode('utf-8', errors='replace')}"
+                    for cmd, _output in zip(cmds, _outputs)
+                ),
+            )
 
-    return _output
+    return b"".join(_outputs)
 
 
 def _rerender_feedstock(*, timeout):
+    from conda_forge_feedstock_ops.container_utils import CF_FEEDSTOCK_OPS_DIR
+    from conda_forge_feedstock_ops.json import loads
     from conda_forge_feedstock_ops.os_utils import (
         get_user_execute_permissions,
         reset_permissions_with_user_execute,
@@ -156,45 +213,47 @@ def _rerender_feedstock(*, timeout):
     logger = logging.getLogger("conda_forge_feedstock_ops.container")
 
     with tempfile.TemporaryDirectory() as tmpdir:
-        input_fs_dir = glob.glob("/cf_feedstock_ops_dir/*-feedstock")
-        assert len(input_fs_dir) == 1, f"expected one feedstock, got {input_fs_dir}"
-        input_fs_dir = input_fs_dir[0]
-        logger.debug(
-            "input container feedstock dir %s: %s",
-            input_fs_dir,
-            os.listdir(input_fs_dir),
-        )
+        input_fs_dir = _find_feedstock_dir(CF_FEEDSTOCK_OPS_DIR)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "input container feedstock dir %s: %s",
+                input_fs_dir,
+                os.listdir(input_fs_dir),
+            )
         input_permissions = os.path.join(
-            "/cf_feedstock_ops_dir",
+            CF_FEEDSTOCK_OPS_DIR,
             f"permissions-{os.path.basename(input_fs_dir)}.json",
         )
-        with open(input_permissions) as f:
-            input_permissions = json.load(f)
+        with open(input_permissions, "rb") as f:
+            # the keys are file paths, so a file named __set__ must not be
+            # turned into a set by the default object hook
+            input_permissions = loads(f.read(), object_hook=None)
 
         fs_dir = os.path.join(tmpdir, os.path.basename(input_fs_dir))
         sync_dirs(input_fs_dir, fs_dir, ignore_dot_git=True, update_git=False)
-        logger.debug(
-            "copied container feedstock dir %s: %s", fs_dir, os.listdir(fs_dir)
-        )
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "copied container feedstock dir %s: %s", fs_dir, os.listdir(fs_dir)
+            )
 
         reset_permissions_with_user_execute(fs_dir, input_permissions)
 
         has_gitignore = os.path.exists(os.path.join(fs_dir, ".gitignore"))
         if has_gitignore:
-            shutil.move(
+            os.rename(
                 os.path.join(fs_dir, ".gitignore"),
                 os.path.join(fs_dir, ".gitignore.bak"),
             )
 
         cmds = [
-            ["git", "init", "-b", "main", "."],
-            ["git", "add", "."],
-            ["git", "commit", "-am", "initial commit"],
+            _git_cmd("init", "-b", "main", "."),
+            _git_cmd("add", "."),
+            _git_cmd("commit", "-am", "initial commit"),
         ]
         if has_gitignore:
             cmds += [
-                ["git", "mv", ".gitignore.bak", ".gitignore"],
-                ["git", "commit", "-am", "put back gitignore"],
+                _git_cmd("mv", ".gitignore.bak", ".gitignore"),
+                _git_cmd("commit", "-am", "put back gitignore"),
             ]
         _execute_git_cmds_and_report(
             cmds=cmds,
@@ -202,26 +261,18 @@ def _rerender_feedstock(*, timeout):
             msg="git init failed for rerender",
         )
 
-        prev_commit = _execute_git_cmds_and_report(
-            cmds=[["git", "rev-parse", "HEAD"]],
-            cwd=fs_dir,
-            msg="git rev-parse HEAD failed for rerender prev commit",
-            ignore_stderr=True,
-        ).strip()
-
         if timeout is not None:
             kwargs = {"timeout": timeout}
         else:
             kwargs = {}
         msg = rerender_local(fs_dir, **kwargs)
 
-        if logger.getEffectiveLevel() <= logging.DEBUG:
+        if logger.isEnabledFor(logging.DEBUG):
+            # status lists staged and unstaged names and diffing against HEAD
+            # covers both the index and the working tree in one process
             cmds = [
-                ["git", "status"],
-                ["git", "diff", "--name-only"],
-                ["git", "diff", "--name-only", "--staged"],
-                ["git", "--no-pager", "diff"],
-                ["git", "--no-pager", "diff", "--staged"],
+                _git_cmd("status"),
+                _git_cmd("--no-pager", "diff", "HEAD"),
             ]
             _execute_git_cmds_and_report(
                 cmds=cmds,
@@ -232,26 +283,19 @@ def _rerender_feedstock(*, timeout):
         if msg is not None:
             output_permissions = get_user_execute_permissions(fs_dir)
 
+            # staging everything and diffing the index against HEAD gives the
+            # patch of the rerender
             _execute_git_cmds_and_report(
-                cmds=[
-                    ["git", "add", "-f", "."],
-                    ["git", "commit", "-am", msg],
-                ],
+                cmds=[_git_cmd("add", "-f", ".")],
                 cwd=fs_dir,
-                msg="git commit failed for rerender",
+                msg="git add failed for rerender",
             )
-            curr_commit = _execute_git_cmds_and_report(
-                cmds=[["git", "rev-parse", "HEAD"]],
-                cwd=fs_dir,
-                msg="git rev-parse HEAD failed for rerender curr commit",
-                ignore_stderr=True,
-            ).strip()
             patch = _execute_git_cmds_and_report(
-                cmds=[["git", "diff", prev_commit + ".." + curr_commit]],
+                cmds=[_git_cmd("diff", "--cached")],
                 cwd=fs_dir,
                 msg="git diff failed for rerender",
                 ignore_stderr=True,
-            )
+            ).decode("utf-8")
         else:
             patch = None
             output_permissions = input_permissions
@@ -264,6 +308,7 @@ def _rerender_feedstock(*, timeout):
 
 
 def _parse_package_and_feedstock_names():
+    from conda_forge_feedstock_ops.container_utils import CF_FEEDSTOCK_OPS_DIR
     from conda_forge_feedstock_ops.os_utils import sync_dirs
     from conda_forge_feedstock_ops.parse_package_and_feedstock_names import (
         parse_package_and_feedstock_names,
@@ -272,20 +317,20 @@ def _parse_package_and_feedstock_names():
     logger = logging.getLogger("conda_forge_feedstock_ops.container")
 
     with tempfile.TemporaryDirectory() as tmpdir:
-        input_fs_dir = glob.glob("/cf_feedstock_ops_dir/*-feedstock")
-        assert len(input_fs_dir) == 1, f"expected one feedstock, got {input_fs_dir}"
-        input_fs_dir = input_fs_dir[0]
-        logger.debug(
-            "input container feedstock dir %s: %s",
-            input_fs_dir,
-            os.listdir(input_fs_dir),
-        )
+        input_fs_dir = _find_feedstock_dir(CF_FEEDSTOCK_OPS_DIR)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "input container feedstock dir %s: %s",
+                input_fs_dir,
+                os.listdir(input_fs_dir),
+            )
 
         fs_dir = os.path.join(tmpdir, os.path.basename(input_fs_dir))
         sync_dirs(input_fs_dir, fs_dir, ignore_dot_git=True, update_git=False)
-        logger.debug(
-            "copied container feedstock dir %s: %s", fs_dir, os.listdir(fs_dir)
-        )
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "copied container feedstock dir %s: %s", fs_dir, os.listdir(fs_dir)
+            )
 
         fs_name, pkg_names, subdirs = parse_package_and_feedstock_names(
             fs_dir, use_container=False
@@ -299,24 +344,27 @@ def _parse_package_and_feedstock_names():
 
 
 def _lint():
+    from conda_forge_feedstock_ops.container_utils import CF_FEEDSTOCK_OPS_DIR
     from conda_forge_feedstock_ops.lint import lint
     from conda_forge_feedstock_ops.os_utils import sync_dirs
 
     logger = logging.getLogger("conda_forge_feedstock_ops.container")
 
     with tempfile.TemporaryDirectory() as tmpdir:
-        input_fs_dir = "/cf_feedstock_ops_dir"
-        logger.debug(
-            "input container feedstock dir %s: %s",
-            input_fs_dir,
-            os.listdir(input_fs_dir),
-        )
+        input_fs_dir = CF_FEEDSTOCK_OPS_DIR
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "input container feedstock dir %s: %s",
+                input_fs_dir,
+                os.listdir(input_fs_dir),
+            )
 
         fs_dir = os.path.join(tmpdir, os.path.basename(input_fs_dir))
         sync_dirs(input_fs_dir, fs_dir, ignore_dot_git=True, update_git=False)
-        logger.debug(
-            "copied container feedstock dir %s: %s", fs_dir, os.listdir(fs_dir)
-        )
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "copied container feedstock dir %s: %s", fs_dir, os.listdir(fs_dir)
+            )
 
         lints, hints, errors = lint(fs_dir, use_container=False)
 
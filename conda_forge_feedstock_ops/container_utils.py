@@ -1,17 +1,24 @@
+import functools
 import json
 import logging
 import os
 import pprint
+import re
+import shlex
 import subprocess
 from collections.abc import Iterable
 from typing import Callable, Optional
 
 from ._version import __version__
+from .json import loads as _cf_json_loads
 
 logger = logging.getLogger(__name__)
 
 DEFAULT_CONTAINER_TMPFS_SIZE_MB = 6000
 
+CF_FEEDSTOCK_OPS_DIR = "/cf_feedstock_ops_dir"
+"""The path in the container where `mount_dir` is mounted."""
+
 CONTAINER_PROXY_MODE = os.environ.get(
     "CF_FEEDSTOCK_OPS_CONTAINER_PROXY_MODE", "false"
 ).lower() in ("yes", "true", "t", "1")
@@ -77,10 +84,15 @@ def get_default_container_run_args(
     list
         The command to run a container.
     """
+    return list(_build_default_container_run_args(tmpfs_size_mb))
+
+
+@functools.lru_cache(maxsize=8)
+def _build_default_container_run_args(tmpfs_size_mb):
     extra_env_vars = []
 
     tmpfs_size_bytes = tmpfs_size_mb * 1000 * 1000
-    return (
+    return tuple(
         [
             "docker",
             "run",
@@ -120,14 +132,25 @@ def get_default_log_level_args(logger):
 def _get_proxy_mode_container_args():
     if not CONTAINER_PROXY_MODE:
         return []
-    assert os.environ["SSL_CERT_FILE"] == os.environ["REQUESTS_CA_BUNDLE"]
-    return [
+    return list(
+        _build_proxy_mode_container_args(
+            os.environ["SSL_CERT_FILE"],
+            os.environ["REQUESTS_CA_BUNDLE"],
+            os.environ.get("no_proxy", ""),
+        )
+    )
+
+
+@functools.lru_cache(maxsize=4)
+def _build_proxy_mode_container_args(ssl_cert_file, requests_ca_bundle, no_proxy):
+    assert ssl_cert_file == requests_ca_bundle
+    return (
         "-e",
         f"http_proxy={PROXY_IN_CONTAINER}",
         "-e",
         f"https_proxy={PROXY_IN_CONTAINER}",
         "-e",
-        f"no_proxy={os.environ.get('no_proxy', '')}",
+        f"no_proxy={no_proxy}",
         "-e",
         "SSL_CERT_FILE=/etc/ssl/certs/ca-certificates.crt",
         "-e",
@@ -135,15 +158,42 @@ def _get_proxy_mode_container_args():
         "--network",
         "host",
         "-v",
-        f"{os.environ['SSL_CERT_FILE']}:/etc/ssl/certs/ca-certificates.crt:ro",
-    ]
+        f"{ssl_cert_file}:/etc/ssl/certs/ca-certificates.crt:ro",
+    )
+
+
+# matches either `ename(body)` with the body running to the last `)` or
+# `ename: body`
+_CONTAINER_ERROR_RE = re.compile(
+    r"(?P<paren_ename>[^(]*)\((?P<paren_body>.*)\)"
+    r"|(?P<colon_ename>[^:]*):(?P<colon_body>.*)",
+    re.DOTALL,
+)
+
+
+def _unescape(s):
+    return s.encode("raw_unicode_escape").decode("unicode_escape")
+
+
+def _parse_container_error(error):
+    m = _CONTAINER_ERROR_RE.match(error)
+    if m is None:
+        return "<could not be parsed", error
+    elif m["paren_ename"] is not None:
+        return _unescape(m["paren_ename"].strip()), _unescape(m["paren_body"])
+    else:
+        return _unescape(m["colon_ename"].strip()), _unescape(m["colon_body"].strip())
+
+
+# JSON loaders that accept UTF-8 bytes, any others get the decoded string
+_BYTES_JSON_LOADS = (json.loads, _cf_json_loads)
 
 
 def run_container_operation(
     args: Iterable[str],
     json_loads: Callable = json.loads,
     tmpfs_size_mb: int = DEFAULT_CONTAINER_TMPFS_SIZE_MB,
-    input: Optional[str] = None,
+    input: Optional[str | bytes] = None,
     mount_dir: Optional[str] = None,
     mount_readonly: bool = True,
     extra_container_args: Optional[Iterable[str]] = None,
@@ -161,7 +211,7 @@ def run_container_operation(
     input
         The input to pass to the container, by default None.
     mount_dir
-        The directory to mount to the container at `/cf_feedstock_ops_dir`, by default None.
+        The directory to mount to the container at `CF_FEEDSTOCK_OPS_DIR`, by default None.
     mount_readonly
         Whether to mount the directory as read-only, by default True.
     extra_container_args
@@ -172,14 +222,17 @@ def run_container_operation(
     data : dict-like
         The result of the operation.
     """
+    # args is iterated again when building error messages, so materialize it
+    args = list(args)
+
     if mount_dir is not None:
-        mount_dir = os.path.abspath(mount_dir)
+        if not os.path.isabs(mount_dir):
+            mount_dir = os.path.abspath(mount_dir)
         mnt_args = [
             "--mount",
-            f"type=bind,source={mount_dir},destination=/cf_feedstock_ops_dir",
+            f"type=bind,source={mount_dir},destination={CF_FEEDSTOCK_OPS_DIR}"
+            + (",readonly" if mount_readonly else ""),
         ]
-        if mount_readonly:
-            mnt_args[-1] += ",readonly"
     else:
         mnt_args = []
 
@@ -193,82 +246,50 @@ def run_container_operation(
         get_default_container_name(),
         *args,
     ]
+    if isinstance(input, str):
+        input = input.encode("utf-8")
     res = subprocess.run(
         cmd,
         stdout=subprocess.PIPE,
-        text=True,
         input=input,
     )
     # we handle this ourselves to customize the error message
     if res.returncode != 0:
+        cmd_str = shlex.join(cmd)
         raise ContainerRuntimeError(
             error=f"Error running '{' '.join(args)}' in container - return code {res.returncode}:"
-            f"\ncmd: {pprint.pformat(cmd)}"
-            f"\noutput: {pprint.pformat(res.stdout)}",
+            f"\ncmd: {cmd_str}"
+            f"\noutput: {pprint.pformat(res.stdout.decode('utf-8', errors='replace'))}",
             args=args,
-            cmd=pprint.pformat(cmd),
+            cmd=cmd_str,
             returncode=res.returncode,
         )
 
     try:
-        ret = json_loads(res.stdout)
-    except json.JSONDecodeError:
+        if json_loads in _BYTES_JSON_LOADS:
+            ret = json_loads(res.stdout)
+        else:
+            ret = json_loads(res.stdout.decode("utf-8"))
+    except ValueError:
+        cmd_str = shlex.join(cmd)
         raise ContainerRuntimeError(
             error=f"Error running '{' '.join(args)}' in container - JSON could not parse stdout:"
-            f"\ncmd: {pprint.pformat(cmd)}"
-            f"\noutput: {pprint.pformat(res.stdout)}",
+            f"\ncmd: {cmd_str}"
+            f"\noutput: {pprint.pformat(res.stdout.decode('utf-8', errors='replace'))}",
             args=args,
-            cmd=pprint.pformat(cmd),
+            cmd=cmd_str,
             returncode=res.returncode,
         )
 
     if "error" in ret:
-        if (
-            "(" in ret["error"]
-            and ")" in ret["error"]
-            and len(ret["error"].split("(", maxsplit=1)) > 1
-        ):
-            ret_str = (
-                ret["error"]
-                .split("(", maxsplit=1)[1]
-                .rsplit(")", maxsplit=1)[0]
-                .encode("raw_unicode_escape")
-                .decode("unicode_escape")
-            )
-            ename = (
-                ret["error"]
-                .split("(")[0]
-                .strip()
-                .encode("raw_unicode_escape")
-                .decode("unicode_escape")
-            )
-        elif ":" in ret["error"] and len(ret["error"].split(":", maxsplit=1)) > 1:
-            ret_str = (
-                ret["error"]
-                .split(":", maxsplit=1)[1]
-                .strip()
-                .encode("raw_unicode_escape")
-                .decode("unicode_escape")
-            )
-            ename = (
-                ret["error"]
-                .split(":")[0]
-                .strip()
-                .encode("raw_unicode_escape")
-                .decode("unicode_escape")
-            )
-        else:
-            ret_str = ret["error"]
-            ename = "<could not be parsed"
+        ename, ret_str = _parse_container_error(ret["error"])
 
         raise ContainerRuntimeError(
             error=f"Error running '{' '.join(args)}' in container - error {ename} raised:\n{ret_str}",
             args=args,
-            cmd=pprint.pformat(cmd),
+            cmd=shlex.join(cmd),
             returncode=res.returncode,
-            traceback=ret["traceback"]
-            .encode("raw_unicode_escape")
-            .decode("unicode_escape"),
+            traceback=_unescape(ret["traceback"]),
         )
 
     return ret["data"]
@@ -29,6 +29,7 @@ def dumps(
     sort_keys: bool = True,
     separators: Any = (",", ":"),
     default: "Callable[[Any], Any]" = default,
+    indent: int | None = 1,
     **kwargs: Any,
 ) -> str:
     """Returns a JSON string from a Python object."""
@@ -37,7 +38,7 @@ def dumps(
         sort_keys=sort_keys,
         # separators=separators,
         default=default,
-        indent=1,
+        indent=indent,
         **kwargs,
     )
 
@@ -48,6 +49,7 @@ def dump(
     sort_keys: bool = True,
     separators: Any = (",", ":"),
     default: "Callable[[Any], Any]" = default,
+    indent: int | None = 1,
     **kwargs: Any,
 ) -> None:
     """Returns a JSON string from a Python object."""
@@ -57,15 +59,15 @@ def dump(
         sort_keys=sort_keys,
         # separators=separators,
         default=default,
-        indent=1,
+        indent=indent,
         **kwargs,
     )
 
 
 def loads(
-    s: str, object_hook: "Callable[[dict], Any]" = object_hook, **kwargs: Any
+    s: str | bytes, object_hook: "Callable[[dict], Any]" = object_hook, **kwargs: Any
 ) -> dict:
-    """Loads a string as JSON, with appropriate object hooks"""
+    """Loads a string or UTF-8 bytes as JSON, with appropriate object hooks"""
     return json.loads(s, object_hook=object_hook, **kwargs)
 
 
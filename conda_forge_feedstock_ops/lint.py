@@ -2,11 +2,8 @@ import logging
 import os
 import shutil
 import tempfile
-from collections import defaultdict
 from pathlib import Path
 
-import conda_smithy.lint_recipe
-
 from conda_forge_feedstock_ops.container_utils import (
     get_default_log_level_args,
     run_container_operation,
@@ -57,16 +54,17 @@ def _lint_containerized(feedstock_dir):
         sync_dirs(feedstock_dir, tmpdir, ignore_dot_git=True, update_git=False)
         chmod_plus_rwX(tmpdir, recursive=True)
 
-        logger.debug(
-            "host feedstock dir %s: %r",
-            feedstock_dir,
-            os.listdir(feedstock_dir),
-        )
-        logger.debug(
-            "copied host feedstock dir %s: %r",
-            tmpdir,
-            os.listdir(tmpdir),
-        )
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "host feedstock dir %s: %r",
+                feedstock_dir,
+                os.listdir(feedstock_dir),
+            )
+            logger.debug(
+                "copied host feedstock dir %s: %r",
+                tmpdir,
+                os.listdir(tmpdir),
+            )
 
         data = run_container_operation(
             args,
@@ -89,17 +87,32 @@ def _lint_containerized(feedstock_dir):
 
 def _find_recipes(path: Path) -> list[Path]:
     """Returns all `meta.yaml` and `recipe.yaml` files in the given path."""
-    meta_yamls = path.rglob("meta.yaml")
-    recipe_yamls = path.rglob("recipe.yaml")
+    # .git is skipped since it is usually the largest subtree of a feedstock
+    recipes = []
+    stack = [path]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name != ".git":
+                            stack.append(entry.path)
+                    elif entry.name in ("meta.yaml", "recipe.yaml"):
+                        recipes.append(Path(entry.path))
+        except PermissionError:
+            pass
 
-    return sorted(set([x for x in (list(meta_yamls) + list(recipe_yamls))]))
+    return sorted(recipes)
 
 
 def _lint_local(feedstock_dir):
+    # imported here so that containerized linting does not import conda-smithy
+    import conda_smithy.lint_recipe
+
     recipes = _find_recipes(Path(feedstock_dir))
 
-    lints = defaultdict(list)
-    hints = defaultdict(list)
+    lints = {}
+    hints = {}
     errors = {}
 
     for recipe in recipes:
@@ -121,7 +134,7 @@ def _lint_local(feedstock_dir):
         hints[rel_path] = _hints
         errors[rel_path] = _error
 
-    return dict(lints), dict(hints), errors
+    return lints, hints, errors
 
 
 # end of code from conda-forge-webservices w/ modifications
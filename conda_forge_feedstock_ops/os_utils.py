@@ -4,8 +4,9 @@ import functools
 import logging
 import os
 import shutil
+import stat
 import subprocess
-from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 logger = logging.getLogger(__name__)
 
@@ -27,13 +28,13 @@ def override_env(name, value):
     old = os.environ.get(name)
     try:
         if value is None:
-            del os.environ[name]
+            os.environ.pop(name, None)
         else:
             os.environ[name] = value
         yield
     finally:
         if old is None:
-            del os.environ[name]
+            os.environ.pop(name, None)
         else:
             os.environ[name] = old
 
@@ -60,9 +61,13 @@ def eval_cmd(cmd: list[str], **kwargs) -> str:
     return c.stdout.decode("utf-8")
 
 
-def _all_fnames(root_dir):
+def _all_fnames(root_dir, ignore_dot_git=False):
     fnames = set()
     for root, dirs, files in os.walk(root_dir):
+        if ignore_dot_git:
+            # prune .git here so that we never walk the git objects
+            dirs[:] = [dr for dr in dirs if dr != ".git"]
+            files = [file for file in files if file != ".git"]
         for file in files:
             fnames.add(os.path.join(root, file))
         for dr in dirs:
@@ -73,6 +78,106 @@ def _all_fnames(root_dir):
     return fnames
 
 
+def _check_not_same_file(src, dst):
+    """Raise `shutil.SameFileError` if `src` and `dst` are the same file."""
+    try:
+        same = os.path.samefile(src, dst)
+    except OSError:
+        # dst does not exist yet
+        same = False
+
+    if same:
+        raise shutil.SameFileError(f"{src!r} and {dst!r} are the same file")
+
+
+def _copyfile(src, dst):
+    """Copy the contents of the file `src` to `dst`.
+
+    For regular files this uses `os.copy_file_range` so that the data is copied
+    inside the kernel (or shared via a reflink on filesystems that support it).
+    We fall back to `shutil.copyfile` if that is not possible.
+    """
+    # opening dst for writing would truncate src if they are the same file
+    _check_not_same_file(src, dst)
+
+    if hasattr(os, "copy_file_range") and stat.S_ISREG(os.stat(src).st_mode):
+        try:
+            if _copy_file_range(src, dst):
+                return
+        except OSError:
+            # e.g., cross-device copies on older kernels or unsupported filesystems
+            pass
+
+    shutil.copyfile(src, dst)
+
+
+def _copy_file_range(src, dst):
+    """Copy `src` to `dst` with `os.copy_file_range`.
+
+    Returns False if the copy stopped before the end of the file, in which
+    case the caller has to copy the data some other way.
+    """
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        # st_size is only a hint (it is 0 for files in /proc for example),
+        # so we copy until copy_file_range reports nothing left
+        size = os.fstat(fsrc.fileno()).st_size
+        blocksize = max(size, 8 * 1024 * 1024)
+        copied = 0
+        while True:
+            n = os.copy_file_range(fsrc.fileno(), fdst.fileno(), blocksize)
+            if n == 0:
+                break
+            copied += n
+
+    # some filesystems (e.g., /proc or some FUSE, virtiofs or NFS mounts)
+    # return 0 before the end of the file instead of raising
+    return copied > 0 and copied >= size
+
+
+def _threaded_map(func, args_list, max_workers=8):
+    """Call `func(*args)` for each tuple of arguments in `args_list`.
+
+    The calls are expected to be I/O bound and release the GIL, so they are done
+    in a thread pool. Any errors are raised.
+    """
+    if len(args_list) <= 1:
+        for args in args_list:
+            func(*args)
+        return
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(args_list))) as pool:
+        # consume the results so that any errors are raised
+        list(pool.map(lambda args: func(*args), args_list))
+
+
+def _copyfiles(src_dest_pairs, max_workers=8):
+    """Copy many files at once in a thread pool."""
+    # check up front, since the pool only raises an error once every other
+    # copy has already run
+    for src, dst in src_dest_pairs:
+        _check_not_same_file(src, dst)
+
+    _threaded_map(_copyfile, src_dest_pairs, max_workers=max_workers)
+
+
+def _git_with_pathspecs(git_args, rel_fnames, cwd):
+    """Run `git *git_args` once for all of `rel_fnames` instead of once per file.
+
+    The paths are passed on stdin so that long lists do not hit the
+    command line length limit.
+    """
+    if not rel_fnames:
+        return
+
+    subprocess.run(
+        ["git", *git_args, "--pathspec-from-file=-", "--pathspec-file-nul"],
+        input="\0".join(rel_fnames).encode("utf-8"),
+        check=True,
+        capture_output=True,
+        cwd=cwd,
+    )
+
+
 def sync_dirs(
     source_dir,
     dest_dir,
@@ -101,14 +206,12 @@ def sync_dirs(
     """
     os.makedirs(dest_dir, exist_ok=True)
 
-    src_fnames = _all_fnames(source_dir)
-    dest_fnames = _all_fnames(dest_dir)
+    src_fnames = _all_fnames(source_dir, ignore_dot_git=ignore_dot_git)
+    dest_fnames = _all_fnames(dest_dir, ignore_dot_git=ignore_dot_git)
 
     # remove files in dest that do not exist in source
+    removed = []
     for dest_fname in dest_fnames:
-        if ignore_dot_git and ".git" in dest_fname.split(os.path.sep):
-            continue
-
         if not os.path.exists(dest_fname):
             continue
 
@@ -119,34 +222,32 @@ def sync_dirs(
                 shutil.rmtree(dest_fname)
             else:
                 os.remove(dest_fname)
-                if update_git:
-                    subprocess.run(
-                        ["git", "rm", "-f", rel_fname],
-                        check=True,
-                        capture_output=True,
-                        cwd=dest_dir,
-                    )
+                removed.append(rel_fname)
 
-    for src_fname in src_fnames:
-        if ignore_dot_git and ".git" in src_fname.split(os.path.sep):
-            continue
+    if update_git:
+        _git_with_pathspecs(["rm", "-f"], removed, dest_dir)
 
+    synced = []
+    to_copy = []
+    added = []
+    for src_fname in src_fnames:
         rel_fname = os.path.relpath(src_fname, source_dir)
         dest_fname = os.path.join(dest_dir, rel_fname)
         if os.path.isdir(src_fname):
             os.makedirs(dest_fname, exist_ok=True)
         else:
             os.makedirs(os.path.dirname(dest_fname), exist_ok=True)
-            shutil.copyfile(src_fname, dest_fname)
-            if update_git:
-                subprocess.run(
-                    ["git", "add", "-f", rel_fname],
-                    check=True,
-                    capture_output=True,
-                    cwd=dest_dir,
-                )
-
-        if sync_stat_metadata:
+            to_copy.append((src_fname, dest_fname))
+            added.append(rel_fname)
+        synced.append((src_fname, dest_fname))
+
+    _copyfiles(to_copy)
+
+    if update_git:
+        _git_with_pathspecs(["add", "-f"], added, dest_dir)
+
+    if sync_stat_metadata:
+        for src_fname, dest_fname in synced:
             shutil.copystat(src_fname, dest_fname)
 
 
@@ -183,11 +284,16 @@ def chmod_plus_rwX(file_or_dir, recursive=False, skip_on_error=False):
     if os.path.isdir(file_or_dir):
         _chmod_plus_rwx(file_or_dir, skip_on_error=skip_on_error)
         if recursive:
+            fnames = []
             for root, dirs, files in os.walk(file_or_dir):
+                # directories are done inline so that the walk can descend into them
                 for d in dirs:
                     _chmod_plus_rwx(os.path.join(root, d), skip_on_error=skip_on_error)
                 for f in files:
-                    _chmod_plus_rw(os.path.join(root, f), skip_on_error=skip_on_error)
+                    fnames.append((os.path.join(root, f),))
+            _threaded_map(
+                functools.partial(_chmod_plus_rw, skip_on_error=skip_on_error), fnames
+            )
     else:
         _chmod_plus_rw(file_or_dir, skip_on_error=skip_on_error)
 
@@ -205,14 +311,11 @@ def get_user_execute_permissions(path):
     dict
         A dictionary mapping file paths to True if the user has execute permission or False otherwise.
     """
-    fnames = _all_fnames(path)
+    fnames = _all_fnames(path, ignore_dot_git=True)
     perms = {}
     for fname in sorted(fnames):
-        if ".git" in fname.split(os.path.sep):
-            continue
-
         perm = os.stat(fname).st_mode
-        has_user_exe = os.stat(fname).st_mode & 0o100
+        has_user_exe = perm & 0o100
         key = os.path.relpath(fname, path)
         logger.debug("got permissions of %s as %#o", key, perm)
         perms[key] = has_user_exe
@@ -232,27 +335,29 @@ def reset_permissions_with_user_execute(path, perms):
     perms : dict
         A dictionary mapping file paths to True if the user has execute permission or False otherwise.
     """
-    fnames = sorted(_all_fnames(path))
+    fnames = sorted(_all_fnames(path, ignore_dot_git=True))
     for fname in fnames:
-        if ".git" in fname.split(os.path.sep):
+        # entries that cannot be stat'ed are skipped
+        try:
+            old_perm = os.stat(fname).st_mode
+        except OSError:
             continue
 
-        if os.path.exists(fname):
-            key = os.path.relpath(fname, path)
-            has_exec = perms.get(key, False)
-
-            if os.path.isdir(fname) or has_exec:
-                new_perm = get_dir_or_exec_default_permissions()
-            else:
-                new_perm = get_file_default_permissions()
+        key = os.path.relpath(fname, path)
+        has_exec = perms.get(key, False)
 
-            logger.debug(
-                "setting permissions of %s to %#o from %#o",
-                key,
-                new_perm,
-                os.stat(fname).st_mode,
-            )
-            os.chmod(fname, new_perm)
+        if stat.S_ISDIR(old_perm) or has_exec:
+            new_perm = get_dir_or_exec_default_permissions()
+        else:
+            new_perm = get_file_default_permissions()
+
+        logger.debug(
+            "setting permissions of %s to %#o from %#o",
+            key,
+            new_perm,
+            old_perm,
+        )
+        os.chmod(fname, new_perm)
 
 
 def _current_umask():
@@ -4,14 +4,7 @@ import os
 import shutil
 import tempfile
 
-import conda_build.api
-import conda_build.config
-import rattler_build_conda_compat.render
-from conda_build.metadata import MetaData
-from conda_build.variants import combine_specs, parse_config_file
-from conda_smithy.utils import get_feedstock_name_from_meta
-from rattler_build_conda_compat.render import MetaData as RattlerBuildMetaData
-from yaml import safe_load
+import yaml
 
 from conda_forge_feedstock_ops.container_utils import (
     get_default_log_level_args,
@@ -21,6 +14,11 @@ from conda_forge_feedstock_ops.container_utils import (
 from conda_forge_feedstock_ops.json import loads
 from conda_forge_feedstock_ops.os_utils import chmod_plus_rwX, override_env, sync_dirs
 
+try:
+    from yaml import CSafeLoader as _YamlSafeLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlSafeLoader
+
 logger = logging.getLogger(__name__)
 CONDA_BUILD = "conda-build"
 RATTLER_BUILD = "rattler-build"
@@ -67,16 +65,17 @@ def _parse_package_and_feedstock_names_containerized(feedstock_dir):
         )
         chmod_plus_rwX(tmpdir, recursive=True)
 
-        logger.debug(
-            "host feedstock dir %s: %r",
-            feedstock_dir,
-            os.listdir(feedstock_dir),
-        )
-        logger.debug(
-            "copied host feedstock dir %s: %r",
-            tmp_feedstock_dir,
-            os.listdir(tmp_feedstock_dir),
-        )
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "host feedstock dir %s: %r",
+                feedstock_dir,
+                os.listdir(feedstock_dir),
+            )
+            logger.debug(
+                "copied host feedstock dir %s: %r",
+                tmp_feedstock_dir,
+                os.listdir(tmp_feedstock_dir),
+            )
 
         data = run_container_operation(
             args,
@@ -98,7 +97,9 @@ def _parse_package_and_feedstock_names_local(feedstock_dir):
     variants = glob.glob(os.path.join(feedstock_dir, ".ci_support", "*.yaml"))
     variants_by_platform_arch = _variants_by_platform_arch(variants)
     recipe_dir = os.path.join(feedstock_dir, "recipe")
-    feedstock_name = _get_feedstock_name_from_feedstock(feedstock_dir)
+    feedstock_name = _get_feedstock_name_from_feedstock(
+        feedstock_dir, build_tool=build_tool
+    )
 
     package_names = set()
     subdirs = set()
@@ -116,17 +117,20 @@ def _parse_package_and_feedstock_names_local(feedstock_dir):
 def _variants_by_platform_arch(variants):
     variants_by_platform_arch = {}
     for variant in variants:
-        platform_arch = "-".join(os.path.basename(variant).split("_")[:2])
-        if platform_arch not in variants_by_platform_arch:
-            variants_by_platform_arch[platform_arch] = []
-        variants_by_platform_arch[platform_arch].append(variant)
+        platform_arch = "-".join(os.path.basename(variant).split("_", 2)[:2])
+        variants_by_platform_arch.setdefault(platform_arch, []).append(variant)
 
     return variants_by_platform_arch
 
 
-def _get_feedstock_name_from_feedstock(feedstock_dir):
+def _get_feedstock_name_from_feedstock(feedstock_dir, build_tool=None):
+    from conda_build.metadata import MetaData
+    from conda_smithy.utils import get_feedstock_name_from_meta
+    from rattler_build_conda_compat.render import MetaData as RattlerBuildMetaData
+
     recipe_dir = os.path.join(feedstock_dir, "recipe")
-    build_tool = _determine_build_tool(feedstock_dir)
+    if build_tool is None:
+        build_tool = _determine_build_tool(feedstock_dir)
 
     if build_tool == CONDA_BUILD:
         return get_feedstock_name_from_meta(MetaData(recipe_dir))
@@ -134,6 +138,11 @@ def _get_feedstock_name_from_feedstock(feedstock_dir):
         return get_feedstock_name_from_meta(RattlerBuildMetaData(recipe_dir))
 
 
+def _safe_load(f):
+    # use the libyaml-backed loader when available, it is much faster
+    return yaml.load(f, Loader=_YamlSafeLoader)
+
+
 #############################################################
 # these functions are pulled out of conda-forge-ci-setup
 
@@ -141,11 +150,14 @@ def _get_feedstock_name_from_feedstock(feedstock_dir):
 def _determine_build_tool(feedstock_root):
     build_tool = CONDA_BUILD
 
-    if feedstock_root and os.path.exists(
-        os.path.join(feedstock_root, "conda-forge.yml")
-    ):
-        with open(os.path.join(feedstock_root, "conda-forge.yml")) as f:
-            conda_forge_config = safe_load(f)
+    if feedstock_root:
+        try:
+            f = open(os.path.join(feedstock_root, "conda-forge.yml"))
+        except FileNotFoundError:
+            return build_tool
+
+        with f:
+            conda_forge_config = _safe_load(f)
 
             if conda_forge_config.get("conda_build_tool", CONDA_BUILD) == RATTLER_BUILD:
                 build_tool = RATTLER_BUILD
@@ -156,6 +168,12 @@ def _determine_build_tool(feedstock_root):
 def _get_built_distribution_names_and_subdirs(
     recipe_dir, variant, build_tool=CONDA_BUILD
 ):
+    # imported here so that containerized parsing does not import conda-build
+    import conda_build.api
+    import conda_build.config
+    import rattler_build_conda_compat.render
+    from conda_build.variants import combine_specs, parse_config_file
+
     additional_config = {}
     for v in variant:
         variant_dir, base_name = os.path.split(v)
@@ -168,7 +186,7 @@ def _get_built_distribution_names_and_subdirs(
         # cribbed from conda_forge_ci_setup.utils
         # some conda-build magic here
         with open(variant[-1]) as f:
-            final_variant = safe_load(f)
+            final_variant = _safe_load(f)
         if "target_platform" in final_variant:
             target_platform = final_variant["target_platform"][0]
             if target_platform != "noarch":
@@ -198,13 +216,17 @@ def _get_built_distribution_names_and_subdirs(
             **additional_config,
         )
 
-    # Print the skipped distributions
-    skipped_distributions = [m for m, _, _ in metas if m.skip()]
-    for m in skipped_distributions:
-        print(f"{m.name()} configuration was skipped in build/skip.")
-
-    subdirs = set([m.config.target_subdir for m, _, _ in metas if not m.skip()])
-    return set([m.name() for m, _, _ in metas if not m.skip()]), subdirs
+    package_names = set()
+    subdirs = set()
+    for m, _, _ in metas:
+        if m.skip():
+            # Print the skipped distributions
+            print(f"{m.name()} configuration was skipped in build/skip.")
+        else:
+            package_names.add(m.name())
+            subdirs.add(m.config.target_subdir)
+
+    return package_names, subdirs
 
 
 # end of functions from conda-forge-ci-setup
@@ -1,18 +1,20 @@
-import json
+import codecs
+import io
 import logging
 import os
+import selectors
 import shutil
 import subprocess
 import sys
 import tempfile
 import time
-from threading import Event, Thread
 
 from conda_forge_feedstock_ops.container_utils import (
     get_default_log_level_args,
     run_container_operation,
     should_use_container,
 )
+from conda_forge_feedstock_ops.json import dump
 from conda_forge_feedstock_ops.os_utils import (
     chmod_plus_rwX,
     get_user_execute_permissions,
@@ -23,6 +25,13 @@ from conda_forge_feedstock_ops.os_utils import (
 
 logger = logging.getLogger(__name__)
 
+# how long to keep reading the output of children left behind by a process
+# after it exits or is killed
+_PIPE_DRAIN_GRACE = 30
+
+# how often to check if a process has exited while waiting for its output
+_POLL_INTERVAL = 0.5
+
 
 def rerender(feedstock_dir, timeout=None, use_container=None):
     """Rerender a feedstock.
@@ -92,20 +101,21 @@ def rerender_containerized(feedstock_dir, timeout=None):
             os.path.join(tmpdir, f"permissions-{os.path.basename(feedstock_dir)}.json"),
             "w",
         ) as f:
-            json.dump(perms, f)
+            dump(perms, f, indent=None)
 
         chmod_plus_rwX(tmpdir, recursive=True)
 
-        logger.debug(
-            "host feedstock dir %s: %r",
-            feedstock_dir,
-            os.listdir(feedstock_dir),
-        )
-        logger.debug(
-            "copied host feedstock dir %s: %r",
-            tmp_feedstock_dir,
-            os.listdir(tmp_feedstock_dir),
-        )
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "host feedstock dir %s: %r",
+                feedstock_dir,
+                os.listdir(feedstock_dir),
+            )
+            logger.debug(
+                "copied host feedstock dir %s: %r",
+                tmp_feedstock_dir,
+                os.listdir(tmp_feedstock_dir),
+            )
 
         data = run_container_operation(
             args,
@@ -139,81 +149,87 @@ def rerender_containerized(feedstock_dir, timeout=None):
     return data["commit_message"]
 
 
-# code to stream i/o like tee from this SO post
-# https://stackoverflow.com/questions/2996887/how-to-replicate-tee-behavior-in-python-when-using-subprocess
-# but it is working and changed a bit to handle two streams
-
-
-class _StreamToStderr(Thread):
-    def __init__(self, buffer, stop_event, timeout=None):
-        super().__init__()
-        self.buffer = buffer
-        self.lines = []
-        self.timeout = timeout
-        self.stop_event = stop_event
-
-    def run(self):
-        t0 = time.time()
-        while True:
-            if self.stop_event.is_set():
-                break
-
-            if self.timeout is not None and time.time() - t0 > self.timeout:
-                break
-
-            try:
-                line = self.buffer.readline()
-            except Exception:
-                line = ""
-
-            if line:
-                self.lines.append(line)
-                sys.stderr.write(line)
-                sys.stderr.flush()
-
-        self.output = "".join(self.lines)
-
-
 def _subprocess_run_tee(args, timeout=None):
+    """Run `args`, echoing its stdout and stderr to our stderr as they arrive.
+
+    The returned process has its combined output as a string in `proc.stdout`.
+    Both pipes are drained from a single thread with a selector. Once the
+    process exits (or is killed at the timeout), children it left behind get
+    at most `_PIPE_DRAIN_GRACE` seconds to close the pipes.
+    """
     proc = subprocess.Popen(
         args,
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
-        text=True,
     )
-    os.set_blocking(proc.stdout.fileno(), False)
-    os.set_blocking(proc.stderr.fileno(), False)
-
-    stop_event = Event()
-    threads = [
-        _StreamToStderr(proc.stdout, stop_event, timeout=timeout),
-        _StreamToStderr(proc.stderr, stop_event, timeout=timeout),
-    ]
-    for out_thread in threads:
-        out_thread.start()
-
-    try:
-        proc.wait(timeout=timeout)
-    except subprocess.TimeoutExpired:
-        proc.kill()
-    finally:
-        stop_event.set()
-        for out_thread in threads:
-            out_thread.join()
-
-        try:
-            out, err = proc.communicate(timeout=30)
-        except Exception:
-            out, err = "", ""
-
-    for line in (err + out).splitlines():
-        sys.stderr.write(line + "\n")
-        sys.stderr.flush()
-
-    final_out = ""
-    for out_thread in threads:
-        final_out += out_thread.output
-    proc.stdout = final_out + out + err
+
+    decoders = {}
+    outputs = {}
+    for stream in (proc.stdout, proc.stderr):
+        decoders[stream] = io.IncrementalNewlineDecoder(
+            codecs.getincrementaldecoder("utf-8")(errors="replace"), translate=True
+        )
+        outputs[stream] = []
+
+    deadline = None if timeout is None else time.monotonic() + timeout
+    exited = False
+    with selectors.DefaultSelector() as sel:
+        for stream in outputs:
+            sel.register(stream, selectors.EVENT_READ)
+
+        while not exited or sel.get_map():
+            if not exited and proc.poll() is not None:
+                exited = True
+                # children of the process may keep the pipes open, so only
+                # give them some time to flush what is left in the pipes
+                deadline = time.monotonic() + _PIPE_DRAIN_GRACE
+                # the pipes may already be closed
+                continue
+
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    if exited:
+                        break
+                    proc.kill()
+                    proc.wait()
+                    continue
+            else:
+                remaining = None
+
+            if not sel.get_map():
+                # the pipes are closed, so only the process is left to wait for
+                try:
+                    proc.wait(timeout=remaining)
+                except subprocess.TimeoutExpired:
+                    pass
+                continue
+
+            if not exited:
+                # wake up regularly to notice when the process exits
+                remaining = (
+                    _POLL_INTERVAL
+                    if remaining is None
+                    else min(remaining, _POLL_INTERVAL)
+                )
+
+            for key, _ in sel.select(timeout=remaining):
+                data = os.read(key.fd, 65536)
+                if not data:
+                    sel.unregister(key.fileobj)
+                    continue
+
+                text = decoders[key.fileobj].decode(data)
+                if text:
+                    outputs[key.fileobj].append(text)
+                    sys.stderr.write(text)
+                    sys.stderr.flush()
+
+    for stream in outputs:
+        outputs[stream].append(decoders[stream].decode(b"", final=True))
+        stream.close()
+
+    proc.stdout = "".join(outputs[proc.stdout]) + "".join(outputs[proc.stderr])
 
     return proc
 
@@ -254,9 +270,16 @@ def rerender_local(feedstock_dir, timeout=None):
     if ret.returncode != 0:
         raise RuntimeError(f"Failed to rerender.\noutput: {ret.stdout}\n")
 
+    # conda-smithy prints the suggested commit near the end of its output, so
+    # search backwards for the last one and only slice out that line
     commit_message = None
-    for line in ret.stdout.split("\n"):
-        if '    git commit -m "MNT: ' in line:
-            commit_message = line.split('git commit -m "')[1].strip()[:-1]
+    loc = ret.stdout.rfind('    git commit -m "MNT: ')
+    if loc != -1:
+        line_start = ret.stdout.rfind("\n", 0, loc) + 1
+        line_end = ret.stdout.find("\n", loc)
+        if line_end == -1:
+            line_end = len(ret.stdout)
+        line = ret.stdout[line_start:line_end]
+        commit_message = line.split('git commit -m "')[1].strip()[:-1]
 
     return commit_message
@@ -1,4 +1,3 @@
-import json
 import os
 import shutil
 import subprocess
@@ -10,32 +9,15 @@ HAVE_CONTAINERS = (
     and subprocess.run(["docker", "--version"], capture_output=True).returncode == 0
 )
 
-if HAVE_CONTAINERS:
-    HAVE_TEST_IMAGE = False
-    try:
-        for line in subprocess.run(
-            [
-                "docker",
-                "images",
-                "--format",
-                "json",
-            ],
-            check=True,
-            capture_output=True,
-            text=True,
-        ).stdout.splitlines():
-            image = json.loads(line)
-            if (
-                image["Repository"] == "conda-forge-feedstock-ops"
-                and image["Tag"] == "test"
-            ):
-                HAVE_TEST_IMAGE = True
-                break
-    except subprocess.CalledProcessError as e:
-        print(
-            f"Could not list local docker images due "
-            f"to error {e}. Skipping container tests!"
-        )
+HAVE_TEST_IMAGE = (
+    HAVE_CONTAINERS
+    and subprocess.run(
+        ["docker", "image", "inspect", "conda-forge-feedstock-ops:test"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    ).returncode
+    == 0
+)
 
 
 skipif_no_containers = pytest.mark.skipif(
@@ -99,3 +81,27 @@ def use_containers():
         os.environ.pop("CF_FEEDSTOCK_OPS_IN_CONTAINER", None)
     else:
         os.environ["CF_FEEDSTOCK_OPS_IN_CONTAINER"] = old_in_container
+
+
+@pytest.fixture(scope="session")
+def solvable_feedstock_repo(tmp_path_factory):
+    """Clone conda-forge-feedstock-check-solvable-feedstock once per session.
+
+    Tests clone from this local copy instead of hitting the network each time.
+    """
+    cache_dir = tmp_path_factory.mktemp("repo-cache")
+    subprocess.run(
+        [
+            "git",
+            "clone",
+            "-q",
+            "--depth",
+            "1",
+            "--single-branch",
+            "https://github.com/conda-forge/conda-forge-feedstock-check-solvable-feedstock.git",
+        ],
+        check=True,
+        stdout=subprocess.DEVNULL,
+        cwd=cache_dir,
+    )
+    return str(cache_dir / "conda-forge-feedstock-check-solvable-feedstock")
@@ -1,4 +1,14 @@
-from conda_forge_feedstock_ops.container_utils import should_use_container
+import json
+import subprocess
+
+import pytest
+
+from conda_forge_feedstock_ops.container_utils import (
+    _parse_container_error,
+    run_container_operation,
+    should_use_container,
+)
+from conda_forge_feedstock_ops.json import loads
 from conda_forge_feedstock_ops.os_utils import override_env
 
 
@@ -23,3 +33,36 @@ def test_should_use_container():
 
     with override_env("CF_FEEDSTOCK_OPS_IN_CONTAINER", "false"):
         assert not should_use_container(use_container=False)
+
+
+@pytest.mark.parametrize(
+    "error,ename,ret_str",
+    [
+        ("ValueError('bad\\nthing (really)')", "ValueError", "'bad\nthing (really)'"),
+        ("KeyError: 'blah'", "KeyError", "'blah'"),
+        ("no structure", "<could not be parsed", "no structure"),
+    ],
+)
+def test_parse_container_error(error, ename, ret_str):
+    assert _parse_container_error(error) == (ename, ret_str)
+
+
+@pytest.fixture
+def fake_container_stdout(monkeypatch):
+    def _run(cmd, **kwargs):
+        return subprocess.CompletedProcess(cmd, 0, stdout=b'{"data": "\xc3\xa9"}\n')
+
+    monkeypatch.setattr(subprocess, "run", _run)
+
+
+@pytest.mark.parametrize("json_loads", [json.loads, loads])
+def test_run_container_operation_bytes_json_loads(fake_container_stdout, json_loads):
+    assert run_container_operation(["blah"], json_loads=json_loads) == "\xe9"
+
+
+def test_run_container_operation_custom_json_loads_gets_str(fake_container_stdout):
+    def _loads(s):
+        assert isinstance(s, str)
+        return json.loads(s.strip())
+
+    assert run_container_operation(["blah"], json_loads=_loads) == "\xe9"
@@ -23,3 +23,9 @@ def test_json_round_trip_file():
             lres = load(fp)
 
         assert data == lres
+
+
+def test_json_loads_no_object_hook():
+    # plain mappings whose keys are file paths, like the rerender permissions
+    data = {"__set__": 0, "recipe/meta.yaml": 64}
+    assert loads(dumps(data), object_hook=None) == data
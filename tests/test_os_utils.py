@@ -0,0 +1,137 @@
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from conda_forge_feedstock_ops.os_utils import _copyfile, override_env, sync_dirs
+
+
+def test_sync_dirs(tmp_path):
+    src = str(tmp_path / "src")
+    dest = str(tmp_path / "dest")
+    os.makedirs(os.path.join(src, "recipe"))
+    os.makedirs(os.path.join(src, ".git"))
+    with open(os.path.join(src, "recipe", "meta.yaml"), "w") as fp:
+        fp.write("package:\n  name: foo\n" * 1000)
+    with open(os.path.join(src, "empty.txt"), "w") as fp:
+        pass
+    with open(os.path.join(src, ".git", "HEAD"), "w") as fp:
+        fp.write("ref: refs/heads/main\n")
+
+    os.makedirs(os.path.join(dest, "old"))
+    with open(os.path.join(dest, "old", "file.txt"), "w") as fp:
+        fp.write("old")
+    os.makedirs(os.path.join(dest, ".git"))
+    with open(os.path.join(dest, ".git", "config"), "w") as fp:
+        fp.write("dest")
+
+    sync_dirs(src, dest, update_git=False)
+
+    assert not os.path.exists(os.path.join(dest, "old"))
+    # .git is neither copied over nor removed from dest
+    assert not os.path.exists(os.path.join(dest, ".git", "HEAD"))
+    with open(os.path.join(dest, ".git", "config")) as fp:
+        assert fp.read() == "dest"
+    with open(os.path.join(dest, "recipe", "meta.yaml")) as fp:
+        assert fp.read() == "package:\n  name: foo\n" * 1000
+    with open(os.path.join(dest, "empty.txt")) as fp:
+        assert fp.read() == ""
+
+
+def test_sync_dirs_update_git(tmp_path):
+    src = str(tmp_path / "src")
+    dest = str(tmp_path / "dest")
+    os.makedirs(os.path.join(src, "recipe"))
+    with open(os.path.join(src, "recipe", "meta.yaml"), "w") as fp:
+        fp.write("package:\n  name: foo\n")
+    with open(os.path.join(src, "new file.txt"), "w") as fp:
+        fp.write("new")
+
+    os.makedirs(dest)
+    subprocess.run(["git", "init", "-q"], check=True, cwd=dest)
+    for fname in ["old.txt", "old2.txt"]:
+        with open(os.path.join(dest, fname), "w") as fp:
+            fp.write("old")
+    subprocess.run(["git", "add", "."], check=True, cwd=dest)
+
+    sync_dirs(src, dest)
+
+    ret = subprocess.run(
+        ["git", "ls-files"],
+        check=True,
+        capture_output=True,
+        text=True,
+        cwd=dest,
+    )
+    assert set(ret.stdout.splitlines()) == {"new file.txt", "recipe/meta.yaml"}
+
+
+def test_override_env_unset_var():
+    name = "CF_FEEDSTOCK_OPS_TEST_OVERRIDE_ENV"
+    assert name not in os.environ
+
+    with override_env(name, None):
+        assert name not in os.environ
+    assert name not in os.environ
+
+    with override_env(name, "1"):
+        assert os.environ[name] == "1"
+    assert name not in os.environ
+
+
+@pytest.mark.parametrize("copy_before_stop", [0, 5])
+def test_copyfile_falls_back_on_short_copy_file_range(
+    tmp_path, monkeypatch, copy_before_stop
+):
+    # some filesystems return 0 from copy_file_range before the end of the file
+    calls = []
+
+    def _short_copy_file_range(src, dst, count, *args):
+        calls.append(count)
+        if len(calls) > 1 or copy_before_stop == 0:
+            return 0
+        return os.write(dst, os.read(src, copy_before_stop))
+
+    monkeypatch.setattr(os, "copy_file_range", _short_copy_file_range, raising=False)
+
+    src = tmp_path / "src.txt"
+    dst = tmp_path / "dst.txt"
+    src.write_text("0123456789" * 100)
+    _copyfile(str(src), str(dst))
+
+    assert calls
+    assert dst.read_text() == "0123456789" * 100
+
+
+@pytest.mark.skipif(
+    not os.path.exists("/proc/self/status"), reason="needs /proc/self/status"
+)
+def test_copyfile_proc_file(tmp_path):
+    # files in /proc report a size of 0 but are not empty
+    dst = tmp_path / "status"
+    _copyfile("/proc/self/status", str(dst))
+    assert "Name:" in dst.read_text()
+
+
+def test_copyfile_same_file(tmp_path):
+    src = tmp_path / "src.txt"
+    src.write_text("hello\n")
+    link = tmp_path / "link.txt"
+    link.symlink_to(src)
+
+    for dst in [src, link]:
+        with pytest.raises(shutil.SameFileError):
+            _copyfile(str(src), str(dst))
+        assert src.read_text() == "hello\n"
+
+
+def test_sync_dirs_same_dir(tmp_path):
+    for i in range(4):
+        (tmp_path / f"file{i}.txt").write_text(f"hello {i}\n")
+
+    with pytest.raises(shutil.SameFileError):
+        sync_dirs(str(tmp_path), str(tmp_path), update_git=False)
+
+    for i in range(4):
+        assert (tmp_path / f"file{i}.txt").read_text() == f"hello {i}\n"
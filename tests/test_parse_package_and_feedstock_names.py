@@ -6,15 +6,8 @@ from conda_forge_feedstock_ops.parse_package_and_feedstock_names import (
     parse_package_and_feedstock_names,
 )
 
-
-def test_parse_package_and_feedstock_names_llvmdev_local():
-    feedstock_dir = os.path.join(os.path.dirname(__file__), "data", "llvmdev-feedstock")
-    feedstock_name, package_names, subdirs = parse_package_and_feedstock_names(
-        feedstock_dir,
-        use_container=False,
-    )
-    assert feedstock_name == "llvmdev"
-    assert package_names == {
+LLVMDEV_PACKAGE_NAMES = frozenset(
+    {
         "llvmdev",
         "libllvm18",
         "llvm",
@@ -23,7 +16,9 @@ def test_parse_package_and_feedstock_names_llvmdev_local():
         "libllvm-c18",
         "lit",
     }
-    assert subdirs == {
+)
+LLVMDEV_SUBDIRS = frozenset(
+    {
         "linux-64",
         "linux-aarch64",
         "linux-ppc64le",
@@ -31,6 +26,18 @@ def test_parse_package_and_feedstock_names_llvmdev_local():
         "osx-64",
         "osx-arm64",
     }
+)
+
+
+def test_parse_package_and_feedstock_names_llvmdev_local():
+    feedstock_dir = os.path.join(os.path.dirname(__file__), "data", "llvmdev-feedstock")
+    feedstock_name, package_names, subdirs = parse_package_and_feedstock_names(
+        feedstock_dir,
+        use_container=False,
+    )
+    assert feedstock_name == "llvmdev"
+    assert package_names == LLVMDEV_PACKAGE_NAMES
+    assert subdirs == LLVMDEV_SUBDIRS
 
 
 @skipif_no_containers
@@ -41,20 +48,5 @@ def test_parse_package_and_feedstock_names_llvmdev_container(use_containers):
         use_container=True,
     )
     assert feedstock_name == "llvmdev"
-    assert package_names == {
-        "llvmdev",
-        "libllvm18",
-        "llvm",
-        "llvm-tools-18",
-        "llvm-tools",
-        "libllvm-c18",
-        "lit",
-    }
-    assert subdirs == {
-        "linux-64",
-        "linux-aarch64",
-        "linux-ppc64le",
-        "win-64",
-        "osx-64",
-        "osx-arm64",
-    }
+    assert package_names == LLVMDEV_PACKAGE_NAMES
+    assert subdirs == LLVMDEV_SUBDIRS